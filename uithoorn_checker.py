@@ -1,24 +1,37 @@
 # uithoorn_checker.py
 
 import os
-import re
 import json
 import time
+import random
+import functools
 import unicodedata
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 
-import pytz
 import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, NoSuchElementException
+from selenium.common.exceptions import (
+    TimeoutException, StaleElementReferenceException, NoSuchElementException, WebDriverException,
+    JavascriptException,
+)
 
 TARGET_URL = "https://avo.hta.nl/uithoorn/Accommodation/Book/106"
+NL_TZ = ZoneInfo("Europe/Amsterdam")
 WEBHOOK_URL = os.environ.get("DISCORD_WEBHOOK_URL", "")  # ← Secrets から注入
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "")
+# 前回までに見つけた枠（日付ごと）。同じ枠を毎回通知しないために使う
+STATE_FILE = os.environ.get("STATE_FILE") or os.path.expanduser("~/.cache/uithoorn/last_seen.json")
+CHROME_CACHE_DIR = os.environ.get("CHROME_CACHE_DIR") or os.path.expanduser("~/.cache/uithoorn/chrome")
+# 0 なら1回だけ実行（cron向け）。正の値なら常駐し、同じブラウザでその秒数ごとに再チェック
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "0"))
 
 SCHEDULE = {
     "Monday":   ["20:00 - 21:30"],
@@ -26,26 +39,62 @@ SCHEDULE = {
     "Saturday": ["17:00 - 18:30"],
     "Sunday":   ["15:30 - 17:00", "14:00 - 15:30"],
 }
+# 予約フォーム / jQuery UI datepicker のロケータ
+LOC_DURATION = (By.ID, "selectedTimeLength")
+LOC_DATEPICKER = (By.ID, "datepicker")
+LOC_YEAR = (By.CSS_SELECTOR, "#ui-datepicker-div select.ui-datepicker-year")
+LOC_MONTH = (By.CSS_SELECTOR, "#ui-datepicker-div select.ui-datepicker-month")
+LOC_TIMESLOT = (By.ID, "customSelectedTimeSlot")
+LOC_TIMESLOT_OPTIONS = (By.CSS_SELECTOR, "#customSelectedTimeSlot option")
+
+# 取得不要なリソース（CDP Network.setBlockedURLs のパターン）
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*facebook.com/tr*", "*hotjar.com*",
+]
+# isoweekday → SCHEDULE の曜日名（対象曜日の一覧もここから作る）
+DOW_EN = {1: "Monday", 4: "Thursday", 6: "Saturday", 7: "Sunday"}
+TARGET_DOWS = tuple(DOW_EN)
 JP_DAY = {"Monday": "月曜日", "Thursday": "木曜日", "Saturday": "土曜日", "Sunday": "日曜日"}
 
-def send_discord_message(message: str):
+# Discord への POST は keep-alive で接続を使い回す
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# 通知の送信をブラウザ終了処理と重ねるためのワーカー（送信結果は呼び出し側で待つ）
+_notify_pool = ThreadPoolExecutor(max_workers=1)
+
+def send_discord_message(message: str) -> bool:
+    """送信できたら True"""
     if not WEBHOOK_URL:
         print("[WARN] DISCORD_WEBHOOK_URL is not set")
-        return
+        return False
     try:
-        requests.post(
-            WEBHOOK_URL,
-            data=json.dumps({"content": message}),
-            headers={"Content-Type": "application/json"},
-            timeout=10,
-        )
+        _http.post(WEBHOOK_URL, json={"content": message}, timeout=10).raise_for_status()
+        return True
     except Exception as e:
         print(f"[WARN] Discord通知エラー: {e}")
+        return False
 
+# 削除対象: 正規表現 \s 相当の空白（NBSP/全角空白を含む, 最大 U+3000）+ ゼロ幅空白 + 各種ダッシュ
+_TIMESLOT_NOISE = str.maketrans("", "", "".join(
+    c for c in map(chr, range(0x3001)) if c.isspace()
+) + "\u200B–—-")
+
+@functools.lru_cache(maxsize=256)
 def normalize_timeslot(s: str) -> str:
     """NBSP, 全角/半角, 各種ダッシュ, 余分な空白の揺れを吸収"""
     s = unicodedata.normalize("NFKC", s)
-    return re.sub(r"[\u00A0\u2000-\u200B\u3000\s–—-]+", "", s)
+    return s.translate(_TIMESLOT_NOISE)
+
+# 曜日ごとの (表示用の時間帯, 正規化済み) を起動時に1回だけ作っておく
+SCHEDULE_NORM = {
+    day: tuple((t, normalize_timeslot(t)) for t in times)
+    for day, times in SCHEDULE.items()
+}
 
 def build_driver() -> webdriver.Chrome:
     opts = Options()
@@ -55,133 +104,380 @@ def build_driver() -> webdriver.Chrome:
     opts.add_argument("--disable-gpu")
     opts.add_argument("--window-size=1920,1080")
     opts.add_argument("--start-maximized")
-    # Selenium Manager にドライバ解決を任せる（ChromeはActions側でインストール）
-    return webdriver.Chrome(options=opts)
+    # 使わないバックグラウンド機能は起動しない
+    opts.add_argument("--disable-extensions")
+    opts.add_argument("--disable-background-networking")
+    opts.add_argument("--disable-sync")
+    opts.add_argument("--disable-translate")
+    opts.add_argument("--disable-default-apps")
+    opts.add_argument("--disable-features=TranslateUI")
+    opts.add_argument("--metrics-recording-only")
+    opts.add_argument("--mute-audio")
+    opts.add_argument("--no-first-run")
+    opts.add_argument("--no-default-browser-check")
+    # ヘッドレスでもタブを「裏」扱いにして処理を間引かれないように
+    opts.add_argument("--disable-renderer-backgrounding")
+    opts.add_argument("--disable-backgrounding-occluded-windows")
+    # JS/CSS のHTTPキャッシュを実行をまたいで残す（常駐モードでのブラウザ再起動時にも効く）
+    opts.add_argument(f"--disk-cache-dir={CHROME_CACHE_DIR}")
+    # DOMContentLoaded で get() を返す（フォーム要素は後続の wait_clickable で待つ）
+    opts.page_load_strategy = "eager"
+    # 画像は読まない（読むのはフォーム要素だけ）
+    opts.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    opts.add_argument("--blink-settings=imagesEnabled=false")
+    # CHROMEDRIVER_PATH があればそれを使い、ドライバ解決（ネットワーク確認）を丸ごと省く。
+    # 無ければ Selenium Manager に任せる（~/.cache/selenium にキャッシュされる。ChromeはActions側でインストール）
+    if CHROMEDRIVER_PATH:
+        driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=opts)
+    else:
+        driver = webdriver.Chrome(options=opts)
+    # 1回のロードで固まらないよう短めに切り、load_booking_page で再試行する
+    driver.set_page_load_timeout(15)
+    # 暗黙待機は使わない（明示的な WebDriverWait と重なり、find_element の不在確認が遅くなるため）
+    driver.implicitly_wait(0)
+    # wait_clickable の execute_async_script 待機（最長20秒）より長く取っておく
+    driver.set_script_timeout(30)
+    # フォント・解析タグもネットワーク段階で遮断。CSSはdatepickerの表示判定に効くので残す
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    except Exception as e:
+        print(f"[WARN] リソース遮断の設定に失敗: {e}")
+    return driver
+
+def wait(driver, timeout: float = 20) -> WebDriverWait:
+    """既定の0.5秒より細かく(0.1秒)ポーリングする WebDriverWait"""
+    return WebDriverWait(driver, timeout, poll_frequency=0.1)
+
+# ページ内の MutationObserver で要素が操作可能になった瞬間に返す（タイムアウト時は null）。
+# DOMが変化せずに表示される場合（CSSの読み込み完了やトランジション）に備えて100msごとにも確認する
+_WAIT_CLICKABLE_JS = """
+const sel = arguments[0], ms = arguments[1], done = arguments[arguments.length - 1];
+const ready = () => {
+  const el = document.querySelector(sel);
+  return el && !el.disabled && el.getClientRects().length > 0 ? el : null;
+};
+const first = ready();
+if (first) { done(first); return; }
+let finished = false;
+const finish = (el) => {
+  if (finished) return;
+  finished = true;
+  obs.disconnect(); clearInterval(poll); clearTimeout(timer);
+  done(el);
+};
+const check = () => { const el = ready(); if (el) finish(el); };
+const obs = new MutationObserver(check);
+const poll = setInterval(check, 100);
+const timer = setTimeout(() => finish(null), ms);
+obs.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+"""
+
+def wait_clickable(driver, locator, timeout: float = 20):
+    """locator（By.ID / By.CSS_SELECTOR）の要素が表示・有効になるまで1往復で待って返す
+
+    WebDriverWait + element_to_be_clickable のようにWebDriver越しにポーリングせず、
+    ページ内で監視する。待機中にページが再読み込みされてスクリプトが失敗した場合は1回だけやり直す。
+    timeout は build_driver のスクリプトタイムアウト（30秒）未満にすること。
+    """
+    by, value = locator
+    css = f"#{value}" if by == By.ID else value
+    try:
+        el = driver.execute_async_script(_WAIT_CLICKABLE_JS, css, int(timeout * 1000))
+    except JavascriptException:
+        el = driver.execute_async_script(_WAIT_CLICKABLE_JS, css, int(timeout * 1000))
+    if el is None:
+        raise TimeoutException(f"{css} が {timeout} 秒以内に操作可能になりませんでした")
+    return el
+
+def load_booking_page(driver, attempts: int = 3):
+    """予約ページを開く。ページロードのタイムアウトは attempts 回まで再試行"""
+    for attempt in range(attempts):
+        try:
+            driver.get(TARGET_URL)
+            return
+        except TimeoutException:
+            if attempt == attempts - 1:
+                raise
+            print(f"[WARN] ページ読み込みがタイムアウト。再試行 {attempt+1}/{attempts}")
+            try:
+                driver.execute_script("window.stop();")
+            except Exception:
+                pass
+
+def select_month(driver, d: date):
+    """開いているカレンダーで d の年 → 月 の順にドロップダウンを選ぶ（年またぎ対策）"""
+    years = driver.find_elements(*LOC_YEAR)
+    if years:
+        Select(years[0]).select_by_value(str(d.year))
+    month_dropdown = wait_clickable(driver, LOC_MONTH)
+    Select(month_dropdown).select_by_value(str(d.month - 1))
+
+# 表示中の年/月が一致すれば当月の日付リンクをクリックして "clicked"、
+# 別の月を表示していれば "wrong-month"、まだ描画されていなければ null を返す
+_CLICK_DAY_JS = (
+    "const [day, year, month] = arguments;"
+    "const m = document.querySelector('#ui-datepicker-div select.ui-datepicker-month');"
+    "const y = document.querySelector('#ui-datepicker-div select.ui-datepicker-year');"
+    "if (!m) return null;"
+    "if (m.value !== month || (y && y.value !== year)) return 'wrong-month';"
+    "const links = document.querySelectorAll("
+    "'#ui-datepicker-div table.ui-datepicker-calendar td:not(.ui-datepicker-other-month) a');"
+    "const a = Array.from(links).find(el => el.textContent.trim() === day);"
+    "if (!a) return null;"
+    "a.click();"
+    "return 'clicked';"
+)
+
+def click_day(driver, d: date) -> bool:
+    """カレンダーが d の年/月を表示していれば、その日のセルをクリックして True
+
+    別の月を表示していた場合はクリックせずに False を返す。
+    年/月の確認・検索・クリックを1回の execute_script で行い、描画待ちはその再試行で兼ねる。
+    """
+    result = wait(driver).until(
+        lambda drv: drv.execute_script(_CLICK_DAY_JS, str(d.day), str(d.year), str(d.month - 1))
+    )
+    return result == "clicked"
+
+def load_seen() -> dict:
+    """STATE_FILE から {日付ISO: [見つかった時間帯, ...]} を読む。無い/壊れていれば空"""
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            seen = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"[WARN] 前回の状態を読めませんでした: {e}")
+        return {}
+    if not (isinstance(seen, dict) and all(
+        isinstance(k, str) and isinstance(v, list) for k, v in seen.items()
+    )):
+        print(f"[WARN] 前回の状態の形式が不正なため無視します: {STATE_FILE}")
+        return {}
+    return seen
 
-def check_availability():
-    driver = None
+def save_seen(seen: dict):
+    """過去日付を捨てて STATE_FILE に書く（一時ファイル経由で置き換え）"""
+    today = datetime.now(NL_TZ).date().isoformat()
+    seen = {d: slots for d, slots in seen.items() if d >= today}
     try:
-        driver = build_driver()
-        driver.get(TARGET_URL)
+        os.makedirs(os.path.dirname(STATE_FILE) or ".", exist_ok=True)
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(seen, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, STATE_FILE)
+    except OSError as e:
+        print(f"[WARN] 状態を保存できませんでした: {e}")
+
+@functools.lru_cache(maxsize=8)
+def target_dates(today: date) -> tuple:
+    """today から2週間後の対象曜日（TARGET_DOWS）を日付順で返す
+
+    日付順にしておくと同じ月が連続し、カレンダーの年/月の選び直しを省ける。
+    常駐モードでは同じ日に何度も呼ばれるので today ごとにキャッシュする。
+    """
+    base = today + timedelta(weeks=2)
+    iso = today.isoweekday()
+    return tuple(sorted(base + timedelta(days=(dow - iso) % 7) for dow in TARGET_DOWS))
+
+def time_slots_replaced(old_select):
+    """WebDriverWait 用: 旧 select が stale になり、新しい select に option が並んだら True"""
+    gone = EC.staleness_of(old_select) if old_select is not None else None
+
+    def _cond(d):
+        if gone is not None and not gone(d):
+            return False
+        return len(d.find_elements(*LOC_TIMESLOT_OPTIONS)) > 1
+    return _cond
+
+def read_time_options(driver) -> list:
+    """#customSelectedTimeSlot の value 付き option の文字列を1往復で取得"""
+    return driver.execute_script(
+        "const sel = document.getElementById('customSelectedTimeSlot');"
+        "if (!sel) return [];"
+        "return Array.from(sel.options).filter(o => o.value).map(o => o.textContent);"
+    )
 
-        # 1) 1.5 uur を選択（テキストに "1,5" を含むものを選ぶ）
-        reservation_duration_dropdown = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.ID, "selectedTimeLength"))
-        )
+def check_availability(driver=None, last_error=None):
+    """driver を渡した場合はそれを使い回し、終了時にも閉じない
+
+    発生したエラーの repr を返す（無事終われば None）。last_error と同じエラーなら
+    Discord へは再送せず標準出力のみにする（常駐モードで同じ通知を繰り返さないため）。
+    """
+    own_driver = driver is None
+    error = None
+    hits = []  # 新しく見つかった枠。Discordへは最後に1通にまとめて送る
+    seen = load_seen()
+    checked = {}  # 今回確認できた日付 → 空いていた時間帯
+    try:
+        # 1) NLの今日から2週間後の対象曜日を算出。対象が無ければブラウザを起動しない
+        today_nl = datetime.now(NL_TZ).date()
+        future_dates = [d for d in target_dates(today_nl) if SCHEDULE_NORM.get(DOW_EN[d.isoweekday()])]
+        if not future_dates:
+            print("チェック対象の日付がありません。")
+            return
+
+        if own_driver:
+            driver = build_driver()
+        load_booking_page(driver)
+
+        # 2) 1.5 uur を選択（まず value="1,5" で直接選び、無ければテキストに "1,5" を含むものを探す）
+        reservation_duration_dropdown = wait_clickable(driver, LOC_DURATION)
         select_len = Select(reservation_duration_dropdown)
-        picked = False
-        for opt in select_len.options:
-            if "1,5" in unicodedata.normalize("NFKC", opt.text):
-                select_len.select_by_value(opt.get_attribute("value"))
-                picked = True
-                break
-        if not picked:
-            raise RuntimeError("1.5時間の選択肢が見つかりません")
-
-        # 2) NLの今日から2週間後の対象曜日を算出（Mon=1, Thu=4, Sat=6, Sun=7）
-        nl_tz = pytz.timezone("Europe/Amsterdam")
-        today_nl = datetime.now(nl_tz).date()
-        dows = [1, 4, 6, 7]
-        targets = [
-            today_nl + timedelta(weeks=2) + timedelta(days=(dow - today_nl.isoweekday()) % 7)
-            for dow in dows
-        ]
-
-        for future_date in targets:
+        try:
+            select_len.select_by_value("1,5")
+        except NoSuchElementException:
+            print('[WARN] value="1,5" の選択肢が無いため、テキストから1.5時間の選択肢を探します')
+            picked = False
+            for opt in select_len.options:
+                if "1,5" in unicodedata.normalize("NFKC", opt.text):
+                    select_len.select_by_value(opt.get_attribute("value"))
+                    picked = True
+                    break
+            if not picked:
+                raise RuntimeError("1.5時間の選択肢が見つかりません")
+
+        shown_ym = None  # カレンダーが現在表示している (年, 月)
+        for future_date in future_dates:
             # 先に曜日名などを決めておく（例外時も正しく出すため）
-            day_of_week_en = future_date.strftime("%A")
-            day_of_week_jp = JP_DAY.get(day_of_week_en, "")
-            required_times = SCHEDULE.get(day_of_week_en, [])
+            day_of_week_en = DOW_EN[future_date.isoweekday()]
+            required_times = SCHEDULE_NORM.get(day_of_week_en, ())
+            date_label = f"{future_date.strftime('%Y年%m月%d日')}（{JP_DAY.get(day_of_week_en, '')}）"
 
             for attempt in range(3):  # 軽いリトライでstale/遅延に強く
                 try:
-                    # 3) カレンダーを開く
-                    calendar_input = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.ID, "datepicker"))
-                    )
+                    # 3) カレンダーを開く（再試行時もここで入力欄が押せるようになるまで待つ）
+                    calendar_input = wait_clickable(driver, LOC_DATEPICKER)
                     calendar_input.click()
 
-                    # 年 → 月 の順に指定（年またぎ対策）
-                    years = driver.find_elements(By.CLASS_NAME, "ui-datepicker-year")
-                    if years:
-                        Select(years[0]).select_by_value(str(future_date.year))
-                    month_dropdown = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, "ui-datepicker-month"))
-                    )
-                    Select(month_dropdown).select_by_value(str(future_date.month - 1))
-
-                    # 当月セルのみクリック
-                    day_xpath = (
-                        "//table[contains(@class,'ui-datepicker-calendar')]"
-                        "//td[not(contains(@class,'ui-datepicker-other-month'))]"
-                        f"/a[text()='{future_date.day}']"
-                    )
+                    # 前回選んだ日付と同じ月なら、datepickerはその月を開き直すはずなので
+                    # ドロップダウン操作を省く（実際の表示月は click_day が確認する）
+                    target_ym = (future_date.year, future_date.month)
+                    if shown_ym != target_ym:
+                        select_month(driver, future_date)
 
                     # 差し替え検出用に旧selectを掴む（無い実装もある）
                     try:
-                        old_select = driver.find_element(By.ID, "customSelectedTimeSlot")
+                        old_select = driver.find_element(*LOC_TIMESLOT)
                     except NoSuchElementException:
                         old_select = None
 
-                    WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.XPATH, day_xpath))).click()
+                    if not click_day(driver, future_date):
+                        # 想定と違う月が開いていた。年/月を選び直してもう一度
+                        shown_ym = None
+                        select_month(driver, future_date)
+                        if not click_day(driver, future_date):
+                            raise TimeoutException(f"カレンダーが {target_ym} を表示していません")
+                    shown_ym = target_ym
 
-                    # 旧selectがあればstaleまで待機＝差し替え完了の目安
-                    if old_select is not None:
-                        try:
-                            WebDriverWait(driver, 20).until(EC.staleness_of(old_select))
-                        except TimeoutException:
-                            pass
-
-                    # 新しいselectの出現と、optionが十分並ぶまで待機
-                    WebDriverWait(driver, 20).until(
-                        EC.presence_of_element_located((By.ID, "customSelectedTimeSlot"))
-                    )
-                    WebDriverWait(driver, 20).until(
-                        lambda d: len(d.find_elements(By.CSS_SELECTOR, "#customSelectedTimeSlot option")) > 1
-                    )
+                    # 旧selectのstale化と新selectのoption充足を1つの待機で確認
+                    try:
+                        wait(driver).until(time_slots_replaced(old_select))
+                    except TimeoutException:
+                        # 旧selectが差し替わらずに残っている実装のときだけ、option数だけで判定し直す。
+                        # 差し替わったのにoptionが並ばない（満枠など）ならそのまま再試行へ
+                        if old_select is None or EC.staleness_of(old_select)(driver):
+                            raise
+                        wait(driver).until(time_slots_replaced(None))
 
-                    # 最終取得して比較
-                    time_dropdown = driver.find_element(By.ID, "customSelectedTimeSlot")
-                    time_options = time_dropdown.find_elements(By.TAG_NAME, "option")
-                    available_norm = [normalize_timeslot(o.text) for o in time_options if o.get_attribute("value")]
+                    # 最終取得して比較（option の文字列は1回の execute_script でまとめて取る）
+                    available_norm = {normalize_timeslot(t) for t in read_time_options(driver)}
 
                     found = False
-                    for t in required_times:
-                        if normalize_timeslot(t) in available_norm:
+                    key = future_date.isoformat()
+                    checked[key] = []
+                    for t, t_norm in required_times:
+                        if t_norm in available_norm:
                             found = True
-                            msg = (
-                                "体育館に空きがあります！\n"
-                                f"日付: {future_date.strftime('%Y年%m月%d日')}（{day_of_week_jp}）\n"
+                            checked[key].append(t)
+                            hit = (
+                                f"日付: {date_label}\n"
                                 f"時間: {t}"
                             )
-                            print(msg)
-                            send_discord_message(msg)
+                            print("体育館に空きがあります！\n" + hit)
+                            if t in seen.get(key, []):
+                                print("（前回から空いている枠のため通知済み）")
+                            else:
+                                hits.append(hit)
 
                     if not found:
-                        print(f"{future_date.strftime('%Y年%m月%d日')}（{day_of_week_jp}）の枠は空いていません。")
+                        print(f"{date_label}の枠は空いていません。")
 
                     break  # 成功したらその日付のリトライは終了
 
                 except (StaleElementReferenceException, TimeoutException) as e:
+                    shown_ym = None  # 表示状態が不明になったので次は年/月から選び直す
                     if attempt < 2:
-                        print(f"[WARN] 一時エラー({type(e).__name__})。{future_date.strftime('%Y年%m月%d日')}（{day_of_week_jp}）を再試行 {attempt+1}/3")
-                        time.sleep(1)
+                        print(f"[WARN] 一時エラー({type(e).__name__})。{date_label}を再試行 {attempt+1}/3")
+                        # 固定sleepは入れない。ループ先頭のカレンダー入力の wait_clickable が待機を兼ねる
                         continue
                     else:
-                        print(f"[ERROR] {type(e).__name__} が連続発生。{future_date.strftime('%Y年%m月%d日')}（{day_of_week_jp}）をスキップ")
+                        print(f"[ERROR] {type(e).__name__} が連続発生。{date_label}をスキップ")
                         break
 
-            time.sleep(2)
-
     except Exception as e:
-        print(f"エラーが発生しました: {repr(e)}")
-        send_discord_message(f"🚨 スクリプト実行中にエラーが発生しました: {repr(e)}")
+        error = repr(e)
+        print(f"エラーが発生しました: {error}")
+        if error != last_error:
+            send_discord_message(f"🚨 スクリプト実行中にエラーが発生しました: {error}")
+        else:
+            print("（前回と同じエラーのため通知は省略）")
     finally:
-        if driver:
+        # 途中で失敗しても、それまでに見つかった枠は通知する。送信はブラウザ終了と並行して行う
+        pending = None
+        if hits:
+            pending = _notify_pool.submit(
+                send_discord_message, "体育館に空きがあります！\n" + "\n\n".join(hits)
+            )
+        if own_driver and driver:
             try:
                 driver.quit()
             except Exception:
                 pass
+        notified = pending.result() if pending else True
+        # 通知に失敗したら状態を更新せず、次回もう一度通知する。確認できなかった日付は前回の状態を残す
+        if checked and notified:
+            try:
+                save_seen({**seen, **checked})
+            except Exception as e:
+                print(f"[WARN] 状態を保存できませんでした: {e}")
+    return error
+
+def run_forever(interval: int):
+    """Chromeを1回だけ起動し、interval 秒（±10%のゆらぎ付き）ごとに check_availability を繰り返す
+
+    ゆらぎを入れて、複数人が同じ間隔で動かしてもアクセスが同時刻に重ならないようにする。
+    """
+    driver = build_driver()
+    last_error = None  # 直前のサイクルのエラー。同じエラーが続く間は通知しない
+    try:
+        while True:
+            try:
+                driver.delete_all_cookies()  # 前回の選択状態を持ち越さない
+            except WebDriverException:
+                # Chromeが落ちた/セッションが切れた場合は作り直す
+                print("[WARN] ブラウザのセッションが失われたため再起動します")
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                driver = build_driver()
+            last_error = check_availability(driver, last_error)
+            time.sleep(interval * random.uniform(0.9, 1.1))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
-    check_availability()
+    if not WEBHOOK_URL:
+        # 通知なしでも結果は標準出力に出るので止めはしない（ローカルでの確認用）
+        print("[WARN] DISCORD_WEBHOOK_URL is not set; results will only be printed")
+    if POLL_INTERVAL > 0:
+        run_forever(POLL_INTERVAL)
+    else:
+        check_availability()